@@ -1,11 +1,12 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, abort
 
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
 
-from bot_core import build_reply
+from bot_core import build_reply, warm_up
 
 app = Flask(__name__)
 
@@ -19,6 +20,14 @@ if not LINE_CHANNEL_ACCESS_TOKEN or not LINE_CHANNEL_SECRET:
 line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
+# 回覆工作丟到背景執行緒，webhook 可以立刻回 200 給 LINE
+REPLY_WORKERS = int(os.getenv("REPLY_WORKERS", "8"))
+_POOL = ThreadPoolExecutor(max_workers=REPLY_WORKERS)
+
+# 訓練檔在背景先載入，不擋住 app 啟動；webhook 先到也只是等同一把鎖
+# （gunicorn --preload 時 fork 出的 worker 會換新鎖並自行補 warm-up，見 bot_core._after_fork_in_child）
+warm_up()
+
 
 @app.route("/", methods=["GET"])
 def home():
@@ -41,12 +50,19 @@ def callback():
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
     user_text = (event.message.text or "").strip()
-    reply_text = build_reply(user_text)
+    _POOL.submit(_reply, event.reply_token, user_text)
 
-    line_bot_api.reply_message(
-        event.reply_token,
-        TextSendMessage(text=reply_text)
-    )
+
+def _reply(reply_token: str, user_text: str):
+    try:
+        reply_text = build_reply(user_text)
+        line_bot_api.reply_message(
+            reply_token,
+            TextSendMessage(text=reply_text)
+        )
+    except Exception as e:
+        # 背景執行緒的例外不會浮到 Flask，這裡自己印出來
+        print(f"[ERROR] reply failed: {e!r}")
 
 
 if __name__ == "__main__":
@@ -1,10 +1,19 @@
+import hashlib
+import heapq
 import os
+import pickle
 import re
-from dataclasses import dataclass
+import sys
+import threading
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 from collections import Counter
+from functools import lru_cache
 
-import pandas as pd
+try:
+    from python_calamine import CalamineWorkbook  # 有裝就用 Rust 版 xlsx 解析器，冷啟動快很多
+except ImportError:
+    CalamineWorkbook = None  # 退回 openpyxl（read_only/data_only 串流讀取）
 
 # =========================
 # 設定
@@ -15,6 +24,11 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.environ.get("TRAINING_FILE", "training.xlsx")
 DATA_PATH = os.path.join(BASE_DIR, DATA_FILE)
 
+# 訓練檔解析結果快取（pickle，以 xlsx 內容 sha1 與 _CACHE_VERSION 比對，內容變動即失效）；設為空字串可停用
+TRAINING_CACHE = os.environ.get("TRAINING_CACHE", DATA_PATH + ".cache.pkl")
+# 快取格式版本：Entry 結構或索引內容改變時請遞增，舊快取會自動作廢
+_CACHE_VERSION = 9
+
 # 覆蓋率門檻：keywords 至少 80% 被使用者輸入「涵蓋」才算命中
 COVERAGE_THRESHOLD = float(os.environ.get("COVERAGE_THRESHOLD", "0.8"))
 
@@ -28,6 +42,9 @@ MAX_YEAR_SPAN = int(os.environ.get("MAX_YEAR_SPAN", "10"))
 # 輸入太短時先引導
 MIN_QUERY_LEN = int(os.environ.get("MIN_QUERY_LEN", "8"))
 
+# 相同問題的回覆快取筆數（LINE 上重複提問很常見）
+REPLY_CACHE_SIZE = int(os.environ.get("REPLY_CACHE_SIZE", "1024"))
+
 # 年度差異摘要「開關」關鍵字：只有出現這些字才顯示摘要
 ANALYSIS_KEYWORDS = ["比較", "變化", "異動", "差異", "增減", "趨勢"]
 
@@ -40,24 +57,59 @@ SURVEY_FOOTER_SUCCESS = ""
 SURVEY_FOOTER_FALLBACK = ""
 
 # 額外：常見同義/寫法修正（可再擴充）
+# 全形空白屬於 \s，交給 _PUNCT_RE 一併移除，不必再多跑一次 replace
 _REPLACEMENTS = [
     ("年度", "年"),
     ("年 度", "年"),
-    ("　", ""),  # 全形空白
 ]
 
+# 標點/空白移除：實測 compiled regex 比 str.translate 快（CJK 字串走不到 translate 的 ASCII 快路徑）
 _PUNCT_RE = re.compile(r"[，,。．、\s]+")
+# _normalize 快路徑：沒有標點/空白/「年度」就不必 strip/replace/sub（\s 與 str.strip 的空白定義相同）
+_NORMALIZE_NEEDED_RE = re.compile(r"[，,。．、\s]|年度")
 _YEAR_RE = re.compile(r"(?P<y>\d{3})\s*年")
+_DIGIT3_RE = re.compile(r"(?P<y>\d{3})")
+_YEAR_PREFIX_RE = re.compile(r"\d{3}\s*年\s*")
+# 多年度：112-113年 / 112至113年 / 112、113年
+_YEAR_RANGE_RE = re.compile(r"(\d{3})\s*[-~－—]\s*(\d{3})\s*年?")
+_YEAR_RANGE_ZH_RE = re.compile(r"(\d{3})\s*(?:至|到)\s*(\d{3})\s*年?")
+_YEAR_ANY_RE = re.compile(r"(\d{3})\s*年?")
+
+# description / 來源欄位解析
+_SOURCE_INLINE_RE = re.compile(r"資料來源[）)】\]:：\s]*\s*(.+)$")
+_SOURCE_PREFIX_RE = re.compile(r"^\s*資料來源\s*[:：]\s*")
+_URL_RE = re.compile(r"(https?://\S+)")
+_INT_RE = re.compile(r"-?\d+")
+_FLOAT_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_TOTAL_VALUE_RE = re.compile(r"(總計|總數|合計)\s*([\d,]+)")
+_TOTAL_UNIT_RE = re.compile(r"(總計|總數|合計)\s*[\d,]+\s*([^\d\s，。；;、()（）]{1,8})")
+
+# 查詢主題的標點清理（行政區查詢另外去掉頓號）
+_TOPIC_PUNCT_RE = re.compile(r"[？\?！!。．，,\s]+")
+_ADMIN_TOPIC_PUNCT_RE = re.compile(r"[？\?！!。．，,、\s]+")
+# 行政區工作表 keyword 內的行政區名稱（例如：113年高雄市鹽埕區...）
+_ADMIN_KW_DISTRICT_RE = re.compile(r"\d{3}\s*年\s*(?P<d>[^\d\s]{1,12}區)")
 
 # 「較上年度 / 較上一年度 / 比上年度 / 比上一年度 / 較前一年度...」等語句
 _CHANGE_RE = re.compile(r"(較|比)\s*(上|前)\s*(一)?\s*(年度|年|期)?")
 _CHANGE_WORDS = ["較上", "較上一", "比上", "比上一", "較前", "比前", "差額", "差距", "變動", "增減", "較去年", "比去年"]
+# _is_change_query 用：_CHANGE_RE 與 _CHANGE_WORDS 合成一個 pattern，一次 search 判斷
+_CHANGE_DETECT_RE = re.compile(_CHANGE_RE.pattern + "|" + "|".join(map(re.escape, _CHANGE_WORDS)))
+
+# _strip_change_phrases 要移除的片語：合併成一個 alternation，一次掃描整句（長字在前）
+_CHANGE_STRIP_WORDS = ["變動", "差額", "差距", "增減", "較去年", "比去年", "上一年度", "上年度", "前一年度", "前年度"]
+_CHANGE_STRIP_RE = re.compile("|".join(map(re.escape, _CHANGE_STRIP_WORDS)))
+
+# _wants_summary 用：分析詞合成一個 alternation，一次 search 判斷
+_ANALYSIS_RE = re.compile("|".join(map(re.escape, ANALYSIS_KEYWORDS)))
+
+# 行政區查詢的連接詞/分隔符號（「以及」需排在「及」前面）
+_ADMIN_CONNECTOR_RE = re.compile("|".join(map(re.escape, ["以及", "及", "與", "和", "、", "，", ",", " "])))
 
 
 def _wants_summary(user_text: str) -> bool:
     """輸入含「比較/變化/異動...」才顯示年度差異摘要（含趨勢一句話）。"""
-    t = str(user_text or "")
-    return any(k in t for k in ANALYSIS_KEYWORDS)
+    return _ANALYSIS_RE.search(str(user_text or "")) is not None
 
 
 def _strip_analysis_keywords(text: str) -> str:
@@ -68,28 +120,36 @@ def _strip_analysis_keywords(text: str) -> str:
     return t.strip()
 
 
+@lru_cache(maxsize=4096)
 def _normalize(text: str) -> str:
+    # 同一則查詢在各比對步驟會被重複正規化，純函式直接記憶結果
     if text is None:
         return ""
-    t = str(text).strip()
+    t = str(text)
+    if _NORMALIZE_NEEDED_RE.search(t) is None:
+        return t
+    t = t.strip()
     for a, b in _REPLACEMENTS:
         t = t.replace(a, b)
     t = _PUNCT_RE.sub("", t)
     return t
 
 
+@lru_cache(maxsize=2048)
 def _extract_year(text: str) -> Optional[str]:
     """抓第一個年度（113年 / 113）"""
-    m = _YEAR_RE.search(str(text or ""))
-    if m:
-        return m.group("y")
-    m2 = re.search(r"(?P<y>\d{3})", str(text or ""))
-    return m2.group("y") if m2 else None
+    # 不能合成單一 alternation：「100 與 113年」要回 113（有「年」者優先，不是最左邊的三位數）
+    t = str(text or "")
+    m = _YEAR_RE.search(t)
+    if m is None:
+        m = _DIGIT3_RE.search(t)
+    return m.group("y") if m else None
 
 
+@lru_cache(maxsize=4096)
 def _strip_year(text_norm: str) -> str:
     t = _YEAR_RE.sub("", text_norm)
-    t = re.sub(r"\d{3}", "", t)
+    t = _DIGIT3_RE.sub("", t)
     return t
 
 
@@ -102,28 +162,33 @@ def extract_years(text: str) -> List[int]:
       - 112,113年 / 112、113年（會取出所有三位數年度）
     回傳：升冪年份清單，例如 [112, 113]
     """
-    s = str(text or "")
+    return list(_extract_years_cached(str(text or "")))
+
+
+@lru_cache(maxsize=2048)
+def _extract_years_cached(s: str) -> Tuple[int, ...]:
+    """extract_years 的快取版本；回傳 tuple，避免呼叫端改到快取內容。"""
 
     # 1) 範圍（含「年」或不含都可）
-    m = re.search(r"(\d{3})\s*[-~－—]\s*(\d{3})\s*年?", s)
+    m = _YEAR_RANGE_RE.search(s)
     if not m:
-        m = re.search(r"(\d{3})\s*(?:至|到)\s*(\d{3})\s*年?", s)
+        m = _YEAR_RANGE_ZH_RE.search(s)
 
     if m:
         y1, y2 = int(m.group(1)), int(m.group(2))
         lo, hi = min(y1, y2), max(y1, y2)
         span = hi - lo + 1
         if span > MAX_YEAR_SPAN:
-            return []
-        return list(range(lo, hi + 1))
+            return ()
+        return tuple(range(lo, hi + 1))
 
     # 2) 非範圍：抓出所有三位數年度（去重）
-    years = re.findall(r"(\d{3})\s*年?", s)
+    years = _YEAR_ANY_RE.findall(s)
     if years:
         uniq = sorted({int(y) for y in years})
-        return uniq
+        return tuple(uniq)
 
-    return []
+    return ()
 
 
 def strip_year_expression(text: str) -> str:
@@ -134,22 +199,20 @@ def strip_year_expression(text: str) -> str:
     s = str(text or "")
 
     # 先去掉範圍
-    s = re.sub(r"\d{3}\s*[-~－—]\s*\d{3}\s*年?", "", s)
-    s = re.sub(r"\d{3}\s*(?:至|到)\s*\d{3}\s*年?", "", s)
+    s = _YEAR_RANGE_RE.sub("", s)
+    s = _YEAR_RANGE_ZH_RE.sub("", s)
 
     # 再去掉單一年（避免殘留）
-    s = re.sub(r"\d{3}\s*年", "", s)
-    s = re.sub(r"\d{3}", "", s)
+    s = _YEAR_RE.sub("", s)
+    s = _DIGIT3_RE.sub("", s)
 
     return s.strip()
 
 
+@lru_cache(maxsize=2048)
 def _is_change_query(text: str) -> bool:
     """偵測『較上年度/較上一年度/變動/差額』等需求。"""
-    t = str(text or "")
-    if _CHANGE_RE.search(t):
-        return True
-    return any(w in t for w in _CHANGE_WORDS)
+    return _CHANGE_DETECT_RE.search(str(text or "")) is not None
 
 
 def _strip_change_phrases(text: str) -> str:
@@ -159,12 +222,11 @@ def _strip_change_phrases(text: str) -> str:
     """
     t = str(text or "")
     t = _CHANGE_RE.sub("", t)
-    for w in ["變動", "差額", "差距", "增減", "較去年", "比去年", "上一年度", "上年度", "前一年度", "前年度"]:
-        t = t.replace(w, "")
+    t = _CHANGE_STRIP_RE.sub("", t)
     return t.strip()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Entry:
     keyword: str
     keyword_norm: str
@@ -173,9 +235,16 @@ class Entry:
     description: str
     unit: str
     source_url: str
+    # 覆蓋率比對用：keyword 的字元計數在載入時算好，查詢時不必每筆重建 Counter
+    kw_counter: Counter = field(init=False, repr=False, compare=False)
+    kw_counter_noyear: Counter = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "kw_counter", Counter(self.keyword_norm))
+        object.__setattr__(self, "kw_counter_noyear", Counter(self.keyword_norm_noyear))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ChangeEntry:
     keyword: str
     keyword_norm: str
@@ -185,11 +254,15 @@ class ChangeEntry:
     unit: str
     source_url_name: str
     source_url: str
+    kw_counter_noyear: Counter = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "kw_counter_noyear", Counter(self.keyword_norm_noyear))
 
 
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AdminEntry:
     keyword: str
     keyword_norm: str
@@ -200,17 +273,49 @@ class AdminEntry:
     unit: str
     source_url_name: str
     source_url: str
+    kw_counter: Counter = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "kw_counter", Counter(self.keyword_norm))
 
 _EXACT_MAP: Dict[str, Entry] = {}
 _ENTRIES: List[Entry] = []
+_ENTRIES_BY_YEAR: Dict[Optional[str], List[Entry]] = {}  # 年度 -> 該年度的條目（維持 _ENTRIES 順序）
+# 字元反向索引：字元 -> [(_ENTRIES 索引, 該字在 keyword_norm 出現次數)]
+_CHAR_INDEX: Dict[str, List[Tuple[int, int]]] = {}
+# 同上，但先依年度分桶：有年度的查詢只累計該年度條目的 posting
+_CHAR_INDEX_BY_YEAR: Dict[Optional[str], Dict[str, List[Tuple[int, int]]]] = {}
+# 同上，改以 keyword_norm_noyear 建索引（少打年度的提醒用）
+_CHAR_INDEX_NOYEAR: Dict[str, List[Tuple[int, int]]] = {}
 
 _CHANGE_ENTRIES: List[ChangeEntry] = []
+_CHANGE_BY_YEAR: Dict[int, List[ChangeEntry]] = {}  # 年度 -> 該年度的變動條目
 _CHANGE_AVAILABLE: bool = False
 _ADMIN_ENTRIES: List[AdminEntry] = []
 _ADMIN_EXACT_MAP: Dict[str, AdminEntry] = {}
+_ADMIN_BY_YEAR: Dict[str, List[AdminEntry]] = {}  # 年度 -> 該年度的行政區條目
 _ADMIN_DISTRICTS: List[str] = []  # 長字先比對
+_ADMIN_DISTRICT_RE: Optional["re.Pattern[str]"] = None  # 全部行政區合成的單一 pattern
 _ADMIN_AVAILABLE: bool = False
 
+# 寫入解析結果快取的全域狀態
+_TRAINING_STATE = (
+    "_EXACT_MAP",
+    "_ENTRIES",
+    "_ENTRIES_BY_YEAR",
+    "_CHAR_INDEX",
+    "_CHAR_INDEX_BY_YEAR",
+    "_CHAR_INDEX_NOYEAR",
+    "_CHANGE_ENTRIES",
+    "_CHANGE_BY_YEAR",
+    "_CHANGE_AVAILABLE",
+    "_ADMIN_ENTRIES",
+    "_ADMIN_EXACT_MAP",
+    "_ADMIN_BY_YEAR",
+    "_ADMIN_DISTRICTS",
+    "_ADMIN_DISTRICT_RE",
+    "_ADMIN_AVAILABLE",
+)
 
 
 def _format_answer(entry: Entry) -> str:
@@ -254,7 +359,7 @@ def _split_desc_and_source(description: str) -> tuple[str, str]:
     marker_line = lines[marker_idx].strip()
 
     # 2) 同一行就帶來源，例如：資料來源：XXX / （資料來源）XXX
-    m = re.search(r"資料來源[）)】\]:：\s]*\s*(.+)$", marker_line)
+    m = _SOURCE_INLINE_RE.search(marker_line)
     if m and m.group(1).strip():
         src = m.group(1).strip()
         return head, src
@@ -285,7 +390,7 @@ def _safe_int(s: str) -> Optional[int]:
     if not t:
         return None
     t = t.replace(",", "")
-    m = re.search(r"-?\d+", t)
+    m = _INT_RE.search(t)
     if not m:
         return None
     try:
@@ -300,7 +405,7 @@ def _safe_float(s: str) -> Optional[float]:
     if not t:
         return None
     t = t.replace(",", "")
-    m = re.search(r"-?\d+(?:\.\d+)?", t)
+    m = _FLOAT_RE.search(t)
     if not m:
         return None
     try:
@@ -310,30 +415,103 @@ def _safe_float(s: str) -> Optional[float]:
 
 
 
-def _load_training() -> None:
+def _intern(s: Optional[str]) -> Optional[str]:
+    """年度/單位/來源等字串在各列大量重複：intern 後共用同一物件（pickle 快取也只存一份）。"""
+    return sys.intern(s) if s else s
+
+
+def _cell_str(v) -> str:
+    """儲存格轉字串（比照舊版 pandas dtype=str：空格為空字串、整數值的 float 去掉 .0）。"""
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+
+def _read_workbook(path: str) -> List[Tuple[str, List[tuple]]]:
+    """
+    整本活頁簿只讀一次，回傳 [(工作表名稱, 各列值 tuple)]（依活頁簿順序）。
+    不經 pandas：小工作表直接逐列取值即可，省下 import 與 DataFrame 建構成本。
+    """
+    sheets: List[Tuple[str, List[tuple]]] = []
+    if CalamineWorkbook is not None:
+        wb = CalamineWorkbook.from_path(path)
+        try:
+            for name in wb.sheet_names:
+                rows = wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+                sheets.append((name, [tuple(r) for r in rows]))
+        finally:
+            wb.close()  # 立即釋放檔案控制代碼（Windows/熱更新時才能覆寫 xlsx）
+        return sheets
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            ws.reset_dimensions()  # read_only 模式的 dimension 可能不準，改為實際掃描
+            sheets.append((ws.title, list(ws.iter_rows(values_only=True))))
+    finally:
+        wb.close()
+    return sheets
+
+
+def _sheet_table(rows: List[tuple]) -> Tuple[Dict[str, int], List[str], List[tuple]]:
+    """
+    第一個非空白列當表頭：回傳 (小寫欄名 -> 欄索引, 原始欄名, 資料列)。
+    全空白列略過（同 pandas 讀表行為）。
+    """
+    rows = [r for r in rows if any(_cell_str(c) for c in r)]
+    if not rows:
+        return {}, [], []
+    header = [_cell_str(c) for c in rows[0]]
+    colmap: Dict[str, int] = {}
+    seen: set[str] = set()
+    for i, name in enumerate(header):
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        colmap[name.strip().lower()] = i
+    return colmap, header, rows[1:]
+
+
+def _column_values(rows: List[tuple], col: Optional[int]) -> List[str]:
+    """取整欄的值（欄位不存在或該列較短就補空字串），供逐列組 Entry 用。"""
+    if col is None:
+        return [""] * len(rows)
+    return [_cell_str(r[col]) if col < len(r) else "" for r in rows]
+
+
+def _parse_training() -> None:
     """
     讀取：
       - Sheet1（主題庫：keywords/description/unit/source_url）
       - 變動（若存在：class/keywords/unit/value/source_url_name/source_url）
     """
-    global _EXACT_MAP, _ENTRIES, _CHANGE_ENTRIES, _CHANGE_AVAILABLE
+    global _EXACT_MAP, _ENTRIES, _ENTRIES_BY_YEAR, _CHAR_INDEX, _CHAR_INDEX_BY_YEAR, _CHAR_INDEX_NOYEAR
+    global _CHANGE_ENTRIES, _CHANGE_BY_YEAR, _CHANGE_AVAILABLE
 
     if not os.path.exists(DATA_PATH):
         print(f"[ERROR] training file not found: {DATA_PATH}")
-        _EXACT_MAP, _ENTRIES = {}, []
-        _CHANGE_ENTRIES, _CHANGE_AVAILABLE = [], False
+        _EXACT_MAP, _ENTRIES, _ENTRIES_BY_YEAR = {}, [], {}
+        _CHAR_INDEX, _CHAR_INDEX_BY_YEAR, _CHAR_INDEX_NOYEAR = {}, {}, {}
+        _CHANGE_ENTRIES, _CHANGE_BY_YEAR, _CHANGE_AVAILABLE = [], {}, False
         return
 
+    # 整本活頁簿只開一次，三張工作表共用
+    sheets = _read_workbook(DATA_PATH)
+    sheet_rows = {str(sn).strip(): rows for sn, rows in reversed(sheets)}
+
     # ---- 主題庫（Sheet1）----
-    df = pd.read_excel(DATA_PATH, sheet_name=0, dtype=str).fillna("")
-    cols = [c.strip().lower() for c in df.columns]
-    colmap = {c.strip().lower(): c for c in df.columns}
+    colmap, header, rows = _sheet_table(sheets[0][1] if sheets else [])
 
     required = ["keywords", "description", "source_url"]
-    missing = [c for c in required if c not in cols]
+    missing = [c for c in required if c not in colmap]
     if missing:
-        print(f"[ERROR] training file missing columns: {missing}. Found: {list(df.columns)}")
-        _EXACT_MAP, _ENTRIES = {}, []
+        print(f"[ERROR] training file missing columns: {missing}. Found: {header}")
+        _EXACT_MAP, _ENTRIES, _ENTRIES_BY_YEAR = {}, [], {}
+        _CHAR_INDEX, _CHAR_INDEX_BY_YEAR, _CHAR_INDEX_NOYEAR = {}, {}, {}
     else:
         kw_col = colmap["keywords"]
         desc_col = colmap["description"]
@@ -343,18 +521,23 @@ def _load_training() -> None:
         exact_map: Dict[str, Entry] = {}
         entries: List[Entry] = []
 
-        for _, r in df.iterrows():
-            kw_raw = str(r.get(kw_col, "")).strip()
-            desc = str(r.get(desc_col, "")).strip()
-            src = str(r.get(src_col, "")).strip()
-            unit = str(r.get(unit_col, "")).strip() if unit_col else ""
+        for kw_v, desc_v, src_v, unit_v in zip(
+            _column_values(rows, kw_col),
+            _column_values(rows, desc_col),
+            _column_values(rows, src_col),
+            _column_values(rows, unit_col),
+        ):
+            kw_raw = kw_v.strip()
+            desc = desc_v.strip()
+            src = _intern(src_v.strip())
+            unit = _intern(unit_v.strip())
 
             if not kw_raw or not desc:
                 continue
 
-            kw_norm = _normalize(kw_raw)
-            y = _extract_year(kw_raw)
-            kw_norm_noyear = _strip_year(kw_norm)
+            kw_norm = _intern(_normalize(kw_raw))
+            y = _intern(_extract_year(kw_raw))
+            kw_norm_noyear = _intern(_strip_year(kw_norm))
 
             e = Entry(
                 keyword=kw_raw,
@@ -368,24 +551,29 @@ def _load_training() -> None:
             exact_map[kw_norm] = e
             entries.append(e)
 
-        _EXACT_MAP, _ENTRIES = exact_map, entries
+        entries_by_year: Dict[Optional[str], List[Entry]] = {}
+        char_index: Dict[str, List[Tuple[int, int]]] = {}
+        char_index_by_year: Dict[Optional[str], Dict[str, List[Tuple[int, int]]]] = {}
+        char_index_noyear: Dict[str, List[Tuple[int, int]]] = {}
+        for i, e in enumerate(entries):
+            entries_by_year.setdefault(e.year, []).append(e)
+            year_index = char_index_by_year.setdefault(e.year, {})
+            for ch, cnt in e.kw_counter.items():
+                char_index.setdefault(ch, []).append((i, cnt))
+                year_index.setdefault(ch, []).append((i, cnt))
+            for ch, cnt in e.kw_counter_noyear.items():
+                char_index_noyear.setdefault(ch, []).append((i, cnt))
+
+        _EXACT_MAP, _ENTRIES, _ENTRIES_BY_YEAR = exact_map, entries, entries_by_year
+        _CHAR_INDEX, _CHAR_INDEX_BY_YEAR, _CHAR_INDEX_NOYEAR = char_index, char_index_by_year, char_index_noyear
         print(f"[DEBUG] training loaded: {DATA_PATH}, entries={len(_ENTRIES)}")
 
     # ---- 變動（可選）----
     change_entries: List[ChangeEntry] = []
     change_available = False
     try:
-        xl = pd.ExcelFile(DATA_PATH)
-        sheet_name = None
-        for sn in xl.sheet_names:
-            if str(sn).strip() == "變動":
-                sheet_name = sn
-                break
-
-        if sheet_name:
-            cdf = pd.read_excel(DATA_PATH, sheet_name=sheet_name, dtype=str).fillna("")
-            ccols = [c.strip().lower() for c in cdf.columns]
-            cmap = {c.strip().lower(): c for c in cdf.columns}
+        if "變動" in sheet_rows:
+            cmap, _, crows = _sheet_table(sheet_rows["變動"])
 
             # 允許欄位彈性（缺少就用空字串）
             kw_col2 = cmap.get("keywords")
@@ -394,19 +582,25 @@ def _load_training() -> None:
             name_col = cmap.get("source_url_name")
             src_col2 = cmap.get("source_url")
 
-            if kw_col2 and val_col:
-                for _, r in cdf.iterrows():
-                    kw_raw = str(r.get(kw_col2, "")).strip()
+            if kw_col2 is not None and val_col is not None:
+                for kw_v, val_v, unit_v, name_v, src_v in zip(
+                    _column_values(crows, kw_col2),
+                    _column_values(crows, val_col),
+                    _column_values(crows, unit_col2),
+                    _column_values(crows, name_col),
+                    _column_values(crows, src_col2),
+                ):
+                    kw_raw = kw_v.strip()
                     if not kw_raw:
                         continue
-                    kw_norm = _normalize(kw_raw)
-                    y = _extract_year(kw_raw)
-                    kw_norm_noyear = _strip_year(kw_norm)
+                    kw_norm = _intern(_normalize(kw_raw))
+                    y = _intern(_extract_year(kw_raw))
+                    kw_norm_noyear = _intern(_strip_year(kw_norm))
 
-                    v = _safe_int(r.get(val_col, ""))
-                    unit = str(r.get(unit_col2, "")).strip() if unit_col2 else ""
-                    source_name = str(r.get(name_col, "")).strip() if name_col else ""
-                    src = str(r.get(src_col2, "")).strip() if src_col2 else ""
+                    v = _safe_int(val_v)
+                    unit = _intern(unit_v.strip())
+                    source_name = _intern(name_v.strip())
+                    src = _intern(src_v.strip())
 
                     change_entries.append(
                         ChangeEntry(
@@ -429,23 +623,20 @@ def _load_training() -> None:
         # 沒有變動sheet：不視為錯誤
         print(f"[DEBUG] change-sheet not loaded: {e}")
 
-    _CHANGE_ENTRIES, _CHANGE_AVAILABLE = change_entries, change_available
+    change_by_year: Dict[int, List[ChangeEntry]] = {}
+    for ce in change_entries:
+        if ce.year:
+            change_by_year.setdefault(int(ce.year), []).append(ce)
+
+    _CHANGE_ENTRIES, _CHANGE_BY_YEAR, _CHANGE_AVAILABLE = change_entries, change_by_year, change_available
     # ---- 行政區（可選）----
     admin_entries: List[AdminEntry] = []
     admin_map: Dict[str, AdminEntry] = {}
     districts: set[str] = set()
     admin_available = False
     try:
-        xl = pd.ExcelFile(DATA_PATH)
-        sheet_name = None
-        for sn in xl.sheet_names:
-            if str(sn).strip() == "行政區":
-                sheet_name = sn
-                break
-
-        if sheet_name:
-            adf = pd.read_excel(DATA_PATH, sheet_name=sheet_name, dtype=str).fillna("")
-            amap = {c.strip().lower(): c for c in adf.columns}
+        if "行政區" in sheet_rows:
+            amap, _, arows = _sheet_table(sheet_rows["行政區"])
 
             kw_col = amap.get("keywords")
             val_col = amap.get("value")
@@ -453,42 +644,48 @@ def _load_training() -> None:
             srcn_col = amap.get("source_url_name")
             src_col = amap.get("source_url")
 
-            if kw_col and val_col:
-                for _, r in adf.iterrows():
-                    kw_raw = str(r.get(kw_col, "")).strip()
+            if kw_col is not None and val_col is not None:
+                for kw_v, val_v, unit_v, srcn_v, src_v in zip(
+                    _column_values(arows, kw_col),
+                    _column_values(arows, val_col),
+                    _column_values(arows, unit_col),
+                    _column_values(arows, srcn_col),
+                    _column_values(arows, src_col),
+                ):
+                    kw_raw = kw_v.strip()
                     if not kw_raw:
                         continue
-                    y = _extract_year(kw_raw)
+                    y = _intern(_extract_year(kw_raw))
                     if not y:
                         continue
 
-                    m = re.search(r"\d{3}\s*年\s*(?P<d>[^\d\s]{1,12}區)", kw_raw)
+                    m = _ADMIN_KW_DISTRICT_RE.search(kw_raw)
                     district_raw = m.group("d") if m else ""
                     # keyword 可能寫成「113年高雄市鹽埕區...」，也可能是「113年鹽埕區...」
                     # 這裡統一把行政區存成「不含高雄市/高雄」的形式，並同時保留原字串供 exact match
-                    district = district_raw.replace("高雄市", "").replace("高雄", "").strip()
+                    district = _intern(district_raw.replace("高雄市", "").replace("高雄", "").strip())
                     if district:
                         districts.add(district)
                     if district_raw and district_raw != district:
                         # 也存一份含市名前綴，避免 query 真的寫「高雄市鹽埕區」時找不到
                         districts.add(district_raw.strip())
 
-                    topic = re.sub(r"\d{3}\s*年\s*", "", kw_raw)
+                    topic = _YEAR_PREFIX_RE.sub("", kw_raw)
                     if district:
                         topic = topic.replace(district, "")
                     topic = topic.strip()
 
-                    v = _safe_float(r.get(val_col, ""))
+                    v = _safe_float(val_v)
                     if v is None:
                         continue
 
-                    unit = str(r.get(unit_col, "")).strip() if unit_col else ""
-                    srcn = str(r.get(srcn_col, "")).strip() if srcn_col else ""
-                    src = str(r.get(src_col, "")).strip() if src_col else ""
+                    unit = _intern(unit_v.strip())
+                    srcn = _intern(srcn_v.strip())
+                    src = _intern(src_v.strip())
 
                     e = AdminEntry(
                         keyword=kw_raw,
-                        keyword_norm=_normalize(kw_raw),
+                        keyword_norm=_intern(_normalize(kw_raw)),
                         year=y,
                         district=district,
                         topic=topic,
@@ -506,12 +703,123 @@ def _load_training() -> None:
 
     globals()["_ADMIN_ENTRIES"] = admin_entries
     globals()["_ADMIN_EXACT_MAP"] = admin_map
-    globals()["_ADMIN_DISTRICTS"] = sorted(list(districts), key=len, reverse=True)
+    admin_by_year: Dict[str, List[AdminEntry]] = {}
+    for e in admin_entries:
+        admin_by_year.setdefault(e.year, []).append(e)
+    globals()["_ADMIN_BY_YEAR"] = admin_by_year
+    district_list = sorted(list(districts), key=len, reverse=True)
+    globals()["_ADMIN_DISTRICTS"] = district_list
+    # lookahead 找出每個行政區可能出現的起點（含「高雄市鹽埕區」內的「鹽埕區」），一次掃描取代逐區 find；
+    # 同一起點只回最長者，共用前綴的較短行政區由 _extract_districts_from_query 在該位置補查
+    globals()["_ADMIN_DISTRICT_RE"] = (
+        re.compile("(?=(" + "|".join(map(re.escape, district_list)) + "))") if district_list else None
+    )
     globals()["_ADMIN_AVAILABLE"] = admin_available
 
 
+def _training_stamp() -> Optional[Tuple[int, str]]:
+    """快取比對用的戳記；訓練檔不存在或停用快取時回 None。"""
+    if not TRAINING_CACHE or not os.path.exists(DATA_PATH):
+        return None
+    # 以檔案內容雜湊比對：mtime 在 git checkout/複製時會變或被保留，都不可靠；
+    # 訓練檔只有數十 KB，讀一次算 sha1 遠比重新解析 xlsx 便宜
+    with open(DATA_PATH, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return _CACHE_VERSION, digest
+
+
+def _read_training_cache(stamp: Tuple[int, str]) -> Optional[Dict[str, object]]:
+    if not os.path.exists(TRAINING_CACHE):
+        return None
+    try:
+        with open(TRAINING_CACHE, "rb") as f:
+            cached_stamp, state = pickle.load(f)
+    except Exception as e:
+        # 快取壞掉就當作沒有，重新解析 xlsx
+        print(f"[DEBUG] training cache not loaded: {e}")
+        return None
+    return state if cached_stamp == stamp else None
+
+
+def _write_training_cache(stamp: Tuple[int, str], state: Dict[str, object]) -> None:
+    # 先寫暫存檔再 os.replace：多個 worker 同時啟動時，不會讀到寫到一半的快取
+    tmp_path = f"{TRAINING_CACHE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((stamp, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, TRAINING_CACHE)
+    except Exception as e:
+        # 寫不進去（例如唯讀檔案系統）不影響服務
+        print(f"[DEBUG] training cache not written: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _load_training() -> None:
+    """
+    載入訓練檔：快取戳記相符就直接還原解析結果，否則解析 xlsx 並更新快取。
+    """
+    stamp = _training_stamp()
+    state = _read_training_cache(stamp) if stamp else None
+    if state is not None:
+        globals().update(state)
+        print(f"[DEBUG] training loaded from cache: {TRAINING_CACHE}, entries={len(_ENTRIES)}")
+    else:
+        _parse_training()
+        if stamp:
+            _write_training_cache(stamp, {k: globals()[k] for k in _TRAINING_STATE})
 
-_load_training()
+    # 訓練檔重新載入後，舊的回覆/條目快取一律作廢
+    _build_reply_cached.cache_clear()
+    _get_entry_for_year_query.cache_clear()
+
+
+_LOADED = False
+_LOAD_LOCK = threading.Lock()
+
+
+def _ensure_loaded() -> None:
+    """
+    第一次查詢時才載入訓練檔（import 本模組不再讀 xlsx，健康檢查等請求不必等載入）。
+    回覆在背景執行緒處理，用鎖避免同時載入多次。
+    """
+    global _LOADED
+    if _LOADED:
+        return
+    with _LOAD_LOCK:
+        if not _LOADED:
+            _load_training()
+            _LOADED = True
+
+
+_WARM_UP_REQUESTED = False
+
+
+def warm_up() -> threading.Thread:
+    """在背景執行緒先載入訓練檔（app 啟動時呼叫），第一則訊息不必等載入。"""
+    global _WARM_UP_REQUESTED
+    _WARM_UP_REQUESTED = True
+    t = threading.Thread(target=_ensure_loaded, name="training-warm-up", daemon=True)
+    t.start()
+    return t
+
+
+def _after_fork_in_child() -> None:
+    """
+    gunicorn --preload 等「import 後才 fork」的情境：
+    fork 時若 warm-up 執行緒正持有 _LOAD_LOCK，子行程裡這把鎖永遠不會被釋放（該執行緒不存在於子行程）。
+    子行程換一把新鎖；父行程尚未載入完成時，由子行程自己重新 warm-up。
+    """
+    global _LOAD_LOCK
+    _LOAD_LOCK = threading.Lock()
+    if _WARM_UP_REQUESTED and not _LOADED:
+        warm_up()
+
+
+if hasattr(os, "register_at_fork"):  # Windows 無 fork
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def _match_by_exact(user_text: str) -> Optional[Entry]:
@@ -521,53 +829,99 @@ def _match_by_exact(user_text: str) -> Optional[Entry]:
     return _EXACT_MAP.get(key)
 
 
-def _coverage_ratio(keyword_norm: str, user_norm: str) -> float:
-    if not keyword_norm:
+def _coverage_from_counter(kw: Counter, kw_len: int, us: Counter) -> float:
+    """
+    覆蓋率：keyword 的字元（含重複次數）有多少比例出現在使用者輸入中。
+    kw/us 為 keyword 與使用者輸入的字元 Counter（keyword 端於載入時算好），kw_len 為 keyword 長度。
+    """
+    if not kw_len:
         return 0.0
-    kw = Counter(keyword_norm)
-    us = Counter(user_norm)
-    hit = sum(min(cnt, us.get(ch, 0)) for ch, cnt in kw.items())
-    return hit / max(1, len(keyword_norm))
+    us_get = us.get
+    hit = sum(min(cnt, us_get(ch, 0)) for ch, cnt in kw.items())
+    return hit / kw_len
 
 
-def _rank_matches(user_text: str, use_year_filter: bool = True) -> List[Tuple[float, int, Entry]]:
-    user_norm = _normalize(user_text)
-    if not user_norm:
-        return []
+def _index_hits(user_norm: str, index: Dict[str, List[Tuple[int, int]]]) -> Dict[int, int]:
+    """
+    用字元反向索引累計每個條目被使用者輸入「涵蓋」的字數（同 _coverage_from_counter 的 hit）。
+    沒出現在結果中的條目，覆蓋率必為 0。
+    """
+    hits: Dict[int, int] = {}
+    for ch, us_cnt in Counter(user_norm).items():
+        for i, kw_cnt in index.get(ch, ()):
+            hits[i] = hits.get(i, 0) + min(kw_cnt, us_cnt)
+    return hits
+
 
+def _top_ranked(ranked: List[Tuple]) -> List[Tuple]:
+    """
+    依 (覆蓋率, 長度) 由大到小取前 SUGGEST_TOPN 筆（呼叫端最多只看這幾筆）。
+    heapq.nlargest 與 sorted(..., reverse=True)[:n] 結果相同（同分維持原順序），但不必整批排序。
+    """
+    return heapq.nlargest(max(SUGGEST_TOPN, 1), ranked, key=lambda x: (x[0], x[1]))
+
+
+def _rank_matches(user_text: str, use_year_filter: bool = True) -> List[Tuple[float, int, Entry]]:
     user_year = _extract_year(user_text) if use_year_filter else None
+    return _rank_matches_norm(_normalize(user_text), user_year)
 
-    candidates = _ENTRIES
-    if user_year and use_year_filter:
-        candidates = [e for e in candidates if e.year == user_year]
 
+def _rank_matches_norm(user_norm: str, user_year: Optional[str]) -> List[Tuple[float, int, Entry]]:
+    """_rank_matches 的本體：傳入已正規化的查詢；user_year 為 None 表示不做年度過濾。"""
+    if not user_norm:
+        return []
+
+    # 只對「至少共用一個字」的條目計分（依 _ENTRIES 原順序，排序結果與全掃描一致）
+    if user_year:
+        index = _CHAR_INDEX_BY_YEAR.get(user_year, {})
+    else:
+        index = _CHAR_INDEX
+    hits = _index_hits(user_norm, index)
     ranked: List[Tuple[float, int, Entry]] = []
-    for e in candidates:
-        r = _coverage_ratio(e.keyword_norm, user_norm)
+    for i in sorted(hits):
+        e = _ENTRIES[i]
         tie = len(e.keyword_norm)
-        ranked.append((r, tie, e))
+        ranked.append((hits[i] / max(1, tie), tie, e))
 
-    ranked.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    return ranked
+    # 候選不足 SUGGEST_TOPN 筆時，候選提示會補上覆蓋率 0 的條目：退回全掃描以維持原排序
+    if len(ranked) < SUGGEST_TOPN:
+        if user_year:
+            candidates = _ENTRIES_BY_YEAR.get(user_year, [])
+        else:
+            candidates = _ENTRIES
 
+        us = Counter(user_norm)
+        ranked = []
+        for e in candidates:
+            r = _coverage_from_counter(e.kw_counter, len(e.keyword_norm), us)
+            tie = len(e.keyword_norm)
+            ranked.append((r, tie, e))
+
+    return _top_ranked(ranked)
 
-def _rank_matches_noyear(user_text: str) -> List[Tuple[float, int, Entry]]:
-    user_norm = _normalize(user_text)
-    if not user_norm:
-        return []
 
-    user_norm_noyear = _strip_year(user_norm)
+def _rank_matches_noyear_norm(user_norm_noyear: str) -> List[Tuple[float, int, Entry]]:
+    """忽略年度的排序：傳入已正規化、已去年度的查詢（少打年度的提醒用）。"""
     if not user_norm_noyear:
         return []
 
+    # 同 _rank_matches：先用索引取候選，候選不足時退回全掃描
+    hits = _index_hits(user_norm_noyear, _CHAR_INDEX_NOYEAR)
     ranked: List[Tuple[float, int, Entry]] = []
-    for e in _ENTRIES:
-        r = _coverage_ratio(e.keyword_norm_noyear, user_norm_noyear)
+    for i in sorted(hits):
+        e = _ENTRIES[i]
         tie = len(e.keyword_norm_noyear)
-        ranked.append((r, tie, e))
+        ranked.append((hits[i] / max(1, tie), tie, e))
+
+    if len(ranked) < SUGGEST_TOPN:
+        us = Counter(user_norm_noyear)
+        ranked = []
+        for e in _ENTRIES:
+            r = _coverage_from_counter(e.kw_counter_noyear, len(e.keyword_norm_noyear), us)
+            tie = len(e.keyword_norm_noyear)
+            ranked.append((r, tie, e))
 
-    ranked.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    return ranked
+    return _top_ranked(ranked)
 
 
 def build_reply_single_year(user_text: str) -> str:
@@ -577,13 +931,14 @@ def build_reply_single_year(user_text: str) -> str:
     text = (user_text or "").strip()
     if not text:
         return DEFAULT_REPLY
+    _ensure_loaded()  # 也可被外部直接呼叫，不一定經過 build_reply
 
     user_norm = _normalize(text)
     user_year = _extract_year(text)
 
     # 1) 少打年度：先提醒補年度（優先於太短引導）
     if not user_year:
-        ranked_noyear = _rank_matches_noyear(text)
+        ranked_noyear = _rank_matches_noyear_norm(_strip_year(user_norm)) if user_norm else []
         if ranked_noyear:
             best_r2, _, _ = ranked_noyear[0]
             if best_r2 >= COVERAGE_THRESHOLD:
@@ -601,13 +956,13 @@ def build_reply_single_year(user_text: str) -> str:
             "- 113年工務局暨所屬職員人數"
         )
 
-    # 3) 完全符合
-    e_exact = _match_by_exact(text)
+    # 3) 完全符合（user_norm 已算好，直接查表，不再經 _match_by_exact 重新正規化）
+    e_exact = _EXACT_MAP.get(user_norm) if user_norm else None
     if e_exact:
         return _format_answer(e_exact)
 
     # 4) 年度一致下的覆蓋率比對
-    ranked = _rank_matches(text, use_year_filter=True)
+    ranked = _rank_matches_norm(user_norm, user_year)
     if ranked:
         best_r, _, best_e = ranked[0]
         if best_r >= COVERAGE_THRESHOLD:
@@ -631,10 +986,12 @@ def build_reply_single_year(user_text: str) -> str:
 # =========================
 # 多年度專用
 # =========================
+@lru_cache(maxsize=4096)
 def _get_entry_for_year_query(query_text: str) -> Optional[Entry]:
     """
     多年度用：給定「已含年度」的 query（例如：113年工務局職員人數），
     直接回傳最可能的 Entry；找不到就回 None。
+    多年度範圍彼此重疊、變動查詢也會回退到這裡，同一組（年度, 主題）常被重複查找，故記憶結果。
     """
     text = (query_text or "").strip()
     if not text:
@@ -655,16 +1012,19 @@ def _get_entry_for_year_query(query_text: str) -> Optional[Entry]:
     return None
 
 
+@lru_cache(maxsize=1024)
 def _extract_total_value(desc_text: str) -> Optional[int]:
-    """從 description 抓總計/總數/合計後面的數字（允許逗號）。"""
+    """從 description 抓總計/總數/合計後面的數字（允許逗號）。
+    description 來自訓練檔、筆數固定，多年度/變動查詢會對同一條目反覆解析，故記憶結果。"""
     if not desc_text:
         return None
-    m = re.search(r"(總計|總數|合計)\s*([\d,]+)", desc_text)
+    m = _TOTAL_VALUE_RE.search(desc_text)
     if not m:
         return None
     return int(m.group(2).replace(",", ""))
 
 
+@lru_cache(maxsize=1024)
 def _fallback_extract_unit(desc_text: str) -> str:
     """
     若 unit 欄沒填，從 description 嘗試抓短單位（避免完全沒單位）。
@@ -672,7 +1032,7 @@ def _fallback_extract_unit(desc_text: str) -> str:
     """
     if not desc_text:
         return ""
-    m = re.search(r"(總計|總數|合計)\s*[\d,]+\s*([^\d\s，。；;、()（）]{1,8})", desc_text)
+    m = _TOTAL_UNIT_RE.search(desc_text)
     return (m.group(2) or "").strip() if m else ""
 
 
@@ -688,7 +1048,7 @@ def _extract_source_text_and_url(ans_text: str) -> Tuple[str, str]:
     source_url = ""
     for i, line in enumerate(lines):
         if not source_url:
-            m = re.search(r"(https?://\S+)", line)
+            m = _URL_RE.search(line)
             if m:
                 source_url = m.group(1)
         if "資料來源" in line and i + 1 < len(lines):
@@ -735,8 +1095,8 @@ def _format_multiyear_reply(
                 return u
         return ""
 
-    def _trend_sentence(years2: List[int], totals2: Dict[int, int], unit: str) -> str:
-        ys = sorted([y for y in years2 if y in totals2])
+    def _trend_sentence(ys: List[int], totals2: Dict[int, int], unit: str) -> str:
+        """ys：有總計數字的年度（已升冪排序）。"""
         if len(ys) < 2:
             return ""
         first_y, last_y = ys[0], ys[-1]
@@ -796,19 +1156,21 @@ def _format_multiyear_reply(
 
         lines_out.append(_format_multiyear_line(y, base_topic, total, unit))
 
-    body = "\n".join(lines_out) if lines_out else "（本次範圍內皆查無符合資料）"
+    # 各段落先收集起來，最後一次以空行串接（避免每段都重建整個 body 字串）
+    blocks: List[str] = ["\n".join(lines_out) if lines_out else "（本次範圍內皆查無符合資料）"]
 
     if missing:
         miss = "、".join([f"{m}年" for m in sorted(missing, reverse=True)])
-        body = f"{body}\n\n（查無資料年度：{miss}）"
+        blocks.append(f"（查無資料年度：{miss}）")
 
     if show_summary and len(totals) >= 2:
+        # totals 的年度都來自 years，趨勢摘要與年度差異摘要共用同一份排序結果
+        ys = sorted(totals.keys())
         summary_unit = _pick_summary_unit(years, unit_map)
-        trend = _trend_sentence(years, totals, summary_unit)
+        trend = _trend_sentence(ys, totals, summary_unit)
         if trend:
-            body = f"{body}\n\n{trend}"
+            blocks.append(trend)
 
-        ys = sorted(totals.keys())
         summary_unit = _pick_summary_unit(ys, unit_map)
 
         summary_lines = ["（年度差異摘要）"]
@@ -820,7 +1182,7 @@ def _format_multiyear_reply(
             sign = "+" if diff >= 0 else ""
             summary_lines.append(f"{y2}年較{y1}年 {sign}{diff:,}{summary_unit}（{sign}{pct:.2f}%）")
 
-        body = f"{body}\n\n" + "\n".join(summary_lines)
+        blocks.append("\n".join(summary_lines))
 
     # 補上資料來源（多年度系列只顯示一次，優先取最新年度）
     source_name = ""
@@ -840,9 +1202,9 @@ def _format_multiyear_reply(
             break
 
     if source_name:
-        body = f"{body}\n\n（資料來源）\n{source_name}"
+        blocks.append(f"（資料來源）\n{source_name}")
 
-    return body
+    return "\n\n".join(blocks)
 
 
 # =========================
@@ -859,17 +1221,13 @@ def _rank_change_matches_for_year(year: int, topic: str) -> List[Tuple[float, in
     topic_norm = _normalize(topic)
     topic_norm_noyear = _strip_year(topic_norm)
 
+    us = Counter(topic_norm_noyear)
     ranked: List[Tuple[float, int, ChangeEntry]] = []
-    for e in _CHANGE_ENTRIES:
-        if not e.year:
-            continue
-        if int(e.year) != int(year):
-            continue
-        r = _coverage_ratio(e.keyword_norm_noyear, topic_norm_noyear)
+    for e in _CHANGE_BY_YEAR.get(year, ()):
+        r = _coverage_from_counter(e.kw_counter_noyear, len(e.keyword_norm_noyear), us)
         tie = len(e.keyword_norm_noyear)
         ranked.append((r, tie, e))
-    ranked.sort(key=lambda x: (x[0], x[1]), reverse=True)
-    return ranked
+    return _top_ranked(ranked)
 
 
 def _get_value_for_year_topic(year: int, topic: str) -> Tuple[Optional[int], str, str]:
@@ -918,7 +1276,7 @@ def _format_change_reply(user_text: str) -> str:
     cleaned = _strip_analysis_keywords(text)
     cleaned = _strip_change_phrases(cleaned)
     topic = strip_year_expression(cleaned).strip()
-    topic = re.sub(r"[？\?！!。．，,\s]+", "", topic)
+    topic = _TOPIC_PUNCT_RE.sub("", topic)
 
     if not topic:
         return "請補充要比較的主題，例如：113年工務局暨所屬職員人數較上一年度變動？"
@@ -967,6 +1325,14 @@ def _format_change_reply(user_text: str) -> str:
 # =========================
 # footer 分流：查到 / 查不到
 # =========================
+# 引導/提醒/候選訊息的開頭（視為未查到）
+_FALLBACK_PREFIXES = (
+    "請輸入更完整的查詢關鍵詞",
+    "看起來您可能少輸入「年度」",
+    "您是不是要找下列資料：",
+)
+
+
 def _is_success_reply(reply: str) -> bool:
     """
     判斷「是否查到資料」：
@@ -982,11 +1348,7 @@ def _is_success_reply(reply: str) -> bool:
     if r == DEFAULT_REPLY:
         return False
 
-    if r.startswith("請輸入更完整的查詢關鍵詞"):
-        return False
-    if r.startswith("看起來您可能少輸入「年度」"):
-        return False
-    if r.startswith("您是不是要找下列資料："):
+    if r.startswith(_FALLBACK_PREFIXES):
         return False
 
     if "（本次範圍內皆查無符合資料）" in r:
@@ -1033,15 +1395,18 @@ def _extract_districts_from_query(text: str) -> List[str]:
         # 允許訓練檔或輸入同時存在「高雄市○○區」與「○○區」
         d2 = d2.replace("高雄市", "").replace("高雄", "")
         return d2
-    found: List[Tuple[int, str]] = []
-    for d in _ADMIN_DISTRICTS:
-        pos = t.find(d)
-        if pos >= 0:
-            found.append((pos, d))
-    found.sort(key=lambda x: x[0])
+    first_pos: Dict[str, int] = {}
+    if _ADMIN_DISTRICT_RE is not None:
+        for m in _ADMIN_DISTRICT_RE.finditer(t):
+            pos = m.start()
+            # lookahead 在同一位置只回最長的一個；同位置開頭的較短行政區（共用前綴）要另外補查
+            for d in _ADMIN_DISTRICTS:
+                if d not in first_pos and t.startswith(d, pos):
+                    first_pos[d] = pos
+    found = sorted(first_pos.items(), key=lambda x: x[1])
     out: List[str] = []
     seen = set()
-    for _, d in found:
+    for d, _ in found:
         cd = _canon(d)
         if cd and cd not in seen:
             out.append(cd)
@@ -1050,9 +1415,7 @@ def _extract_districts_from_query(text: str) -> List[str]:
 
 
 def _strip_admin_connectors(s: str) -> str:
-    for w in ["以及", "及", "與", "和", "、", "，", ",", " "]:
-        s = s.replace(w, "")
-    return s.strip()
+    return _ADMIN_CONNECTOR_RE.sub("", s).strip()
 
 
 def _format_admin_reply(text: str) -> str:
@@ -1075,12 +1438,12 @@ def _format_admin_reply(text: str) -> str:
         return ""
 
     # 1) 抽出主題：去年度、去城市前綴、去所有行政區、去連接詞、去標點
-    topic = re.sub(r"\d{3}\s*年\s*", "", str(text))
+    topic = _YEAR_PREFIX_RE.sub("", str(text))
     topic = topic.replace("高雄市", "").replace("高雄", "")
     for d in districts:
         topic = topic.replace(d, "")
     topic = _strip_admin_connectors(topic)
-    topic = re.sub(r"[？\?！!。．，,、\s]+", "", topic).strip()
+    topic = _ADMIN_TOPIC_PUNCT_RE.sub("", topic).strip()
     if not topic:
         return ""
 
@@ -1100,16 +1463,14 @@ def _format_admin_reply(text: str) -> str:
                 return e0
 
         # 再用覆蓋率比對兜底：同年度 + keyword 含該行政區
-        want_norms = [_normalize(c) for c in candidates]
+        want_counters = [Counter(_normalize(c)) for c in candidates]
         best_e: Optional[AdminEntry] = None
         best_r = 0.0
-        for e in _ADMIN_ENTRIES:
-            if e.year != str(year):
-                continue
+        for e in _ADMIN_BY_YEAR.get(year, ()):
             if (d not in e.keyword) and (f"高雄市{d}" not in e.keyword) and (f"高雄{d}" not in e.keyword):
                 continue
-            for wn in want_norms:
-                r = _coverage_ratio(e.keyword_norm, wn)
+            for wc in want_counters:
+                r = _coverage_from_counter(e.kw_counter, len(e.keyword_norm), wc)
                 if r > best_r:
                     best_r = r
                     best_e = e
@@ -1130,7 +1491,7 @@ def _format_admin_reply(text: str) -> str:
 
         if not picked_src:
             src = _clean_source_name(e.source_url_name) or _clean_source_name(e.source_url)
-            src = re.sub(r"^\s*資料來源\s*[:：]\s*", "", src).strip()
+            src = _SOURCE_PREFIX_RE.sub("", src).strip()
             if src:
                 picked_src = src
 
@@ -1153,7 +1514,17 @@ def build_reply(user_text: str) -> str:
     text = (user_text or "").strip()
     if not text:
         return _append_survey_footer(DEFAULT_REPLY)
+    _ensure_loaded()
+    return _build_reply_cached(text)
+
 
+@lru_cache(maxsize=REPLY_CACHE_SIZE)
+def _build_reply_cached(text: str) -> str:
+    """
+    build_reply 的實際流程（text 已 strip）。
+    以原始字串為 key：多年度/變動回覆會沿用使用者輸入的主題文字，
+    正規化後的字串不足以還原回覆內容。
+    """
     # 0) 較上年度比較（優先於多年度）
     if _is_change_query(text):
         reply = _format_change_reply(text)
@@ -1187,4 +1558,5 @@ def build_reply(user_text: str) -> str:
     # 2) 單年度
     reply = build_reply_single_year(text)
     reply = _prepend_result_header(reply)
-    return _append_survey_footer(reply)
\ No newline at end of file
+    return _append_survey_footer(reply)
+
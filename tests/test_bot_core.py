@@ -0,0 +1,37 @@
+import os
+import re
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot_core  # noqa: E402
+
+
+def _district_patch(districts):
+    district_list = sorted(districts, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, district_list)) + "))")
+    return mock.patch.multiple(
+        bot_core,
+        _ADMIN_AVAILABLE=True,
+        _ADMIN_DISTRICTS=district_list,
+        _ADMIN_DISTRICT_RE=pattern,
+    )
+
+
+class ExtractDistrictsTest(unittest.TestCase):
+    def test_shared_prefix_districts_both_found(self):
+        # 同一起點的「鳳山區社區」與「鳳山區」都要抽出（同逐區 find 的結果）
+        with _district_patch(["鳳山區社區", "鳳山區"]):
+            got = bot_core._extract_districts_from_query("113年鳳山區社區人數")
+        self.assertEqual(got, ["鳳山區社區", "鳳山區"])
+
+    def test_city_prefixed_district_deduped(self):
+        with _district_patch(["高雄市鹽埕區", "鹽埕區", "苓雅區"]):
+            got = bot_core._extract_districts_from_query("113年高雄市鹽埕區及苓雅區人口")
+        self.assertEqual(got, ["鹽埕區", "苓雅區"])
+
+
+if __name__ == "__main__":
+    unittest.main()